@@ -1,15 +1,22 @@
 from __future__ import annotations
-import queue
+import asyncio
 import threading
+from concurrent.futures import Future
 from app_common import build_context, console, is_exit_phrase, print_agent
-from dialogue import dialogue_manager
+from dialogue import CANNED_PROMPTS, dialogue_manager
 from voice_out import VoiceOut
 
 
 _speaking = threading.Event()
-_tts_thread: threading.Thread | None = None
 _voice = VoiceOut(rate=180, volume=1.0, voice="en-US-JennyNeural")
 
+_GREETING = (
+    "Hello! Before we start: this conversation will be recorded for quality and claims handling in line with GDPR. "
+    "By continuing, you consent to this recording. How can I help today?"
+)
+_REPEAT = "I didn’t catch that. Could you repeat?"
+_GOODBYE = "Goodbye!"
+
 
 def is_speaking() -> bool:
     return _speaking.is_set()
@@ -23,29 +30,37 @@ def _stop_tts() -> None:
             _speaking.clear()
 
 
-def tts_speak_async(text: str) -> None:
-    cleaned = print_agent(text)
-    if not cleaned:
-        return
-
-    _stop_tts()
-
-    def _run() -> None:
+async def _tts_worker(tts_queue: asyncio.Queue[str]) -> None:
+    while True:
+        text = await tts_queue.get()
         _speaking.set()
         try:
-            _voice.say(cleaned)
+            await asyncio.to_thread(_voice.say, text)
         finally:
             _speaking.clear()
+            tts_queue.task_done()
 
-    global _tts_thread
-    _tts_thread = threading.Thread(target=_run, daemon=True)
-    _tts_thread.start()
 
+async def tts_speak(tts_queue: asyncio.Queue[str], text: str) -> None:
+    # The reply is spoken, so skip Rich panel layout and just log the line.
+    cleaned = print_agent(text, rich=False)
+    if not cleaned:
+        return
 
-def start_call() -> None:
+    # A new reply supersedes anything still playing or waiting to play.
+    _stop_tts()
+    while not tts_queue.empty():
+        tts_queue.get_nowait()
+        tts_queue.task_done()
+    await tts_queue.put(cleaned)
+
+
+async def start_call() -> None:
+    # Renders the fixed lines in the background while the models load.
+    _voice.prewarm((_GREETING, _REPEAT, _GOODBYE, *CANNED_PROMPTS))
     ctx = build_context("./docs")
 
-    from voice_loop import VADRecorder, WhisperSTT
+    from voice_loop import STTResult, VADRecorder, WhisperSTT
 
     stt = WhisperSTT(model_size="small")
     vad = VADRecorder(
@@ -55,46 +70,69 @@ def start_call() -> None:
         max_utterance_s=12.0,
     )
 
-    tts_speak_async(
-        "Hello! Before we start: this conversation will be recorded for quality and claims handling in line with GDPR. "
-        "By continuing, you consent to this recording. How can I help today?"
-    )
+    loop = asyncio.get_running_loop()
+    tts_queue: asyncio.Queue[str] = asyncio.Queue()
+    # One future per utterance, in capture order; each resolves when its last chunk is decoded.
+    text_queue: asyncio.Queue[asyncio.Future[STTResult]] = asyncio.Queue()
+    tts_task = asyncio.create_task(_tts_worker(tts_queue))
+
+    await tts_speak(tts_queue, _GREETING)
 
-    wav_queue: queue.Queue[str] = queue.Queue()
     stop_flag = threading.Event()
 
+    def _enqueue(fut: Future[STTResult]) -> None:
+        text_queue.put_nowait(asyncio.wrap_future(fut))
+
+    # The listener stays on a daemon thread (not the default executor) because
+    # capture blocks until the next utterance and must not hold up shutdown.
+    # Chunks are transcribed while the user is still speaking, and the final
+    # decode is handed off as a future, so capture of the next utterance
+    # starts while the last chunk of this one is still being transcribed.
     def _listener() -> None:
         while not stop_flag.is_set():
-            wav_path = vad.listen_utterance(is_speaking_flag=is_speaking, on_barge_in=_stop_tts)
-            if wav_path:
-                wav_queue.put(wav_path)
+            try:
+                chunks = vad.stream_utterance(is_speaking_flag=is_speaking, on_barge_in=_stop_tts)
+                fut = stt.submit_stream(chunks)
+            except Exception as exc:
+                # A dead listener would leave the call waiting forever; pass the
+                # failure on so the turn falls through to "I didn't catch that".
+                fut = Future()
+                fut.set_exception(exc)
+                stop_flag.wait(0.5)  # don't spin if the device keeps failing
+            loop.call_soon_threadsafe(_enqueue, fut)
 
     threading.Thread(target=_listener, daemon=True).start()
 
     while True:
-        wav_path = wav_queue.get()
+        try:
+            user_text = ((await (await text_queue.get())).text or "").strip()
+        except Exception as exc:
+            console.print(f"[red]Listening failed:[/red] {exc}")
+            user_text = ""
         _stop_tts()
 
-        res = stt.transcribe(wav_path)
-        user_text = (res.text or "").strip()
         if not user_text:
-            tts_speak_async("I didn’t catch that. Could you repeat?")
+            await tts_speak(tts_queue, _REPEAT)
             continue
 
         console.print(f"[bold cyan]You[/bold cyan]: {user_text}")
 
         if is_exit_phrase(user_text):
             stop_flag.set()
-            tts_speak_async("Goodbye!")
+            await tts_speak(tts_queue, _GOODBYE)
             break
 
         turn = dialogue_manager(user_text, ctx.state, ctx.rag)
-        tts_speak_async(turn.response_text)
+        await tts_speak(tts_queue, turn.response_text)
 
         if turn.end_call:
             stop_flag.set()
             break
 
+    await tts_queue.join()
+    tts_task.cancel()
+    _voice.shutdown()
+
 
 if __name__ == "__main__":
-    start_call()
+    asyncio.run(start_call())
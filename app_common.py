@@ -1,11 +1,12 @@
 from __future__ import annotations
+import sys
 from dataclasses import dataclass
-from typing import Iterable, List
+from typing import Iterable, List, Optional
 from rich.console import Console
 from rich.panel import Panel
 
 from dialogue import SessionState
-from rag import RAGIndex
+from rag import RAGIndex, docs_digest
 
 console = Console()
 
@@ -21,6 +22,7 @@ EXIT_PHRASES: List[str] = [
     "close",
     "disconnect",
 ]
+_EXIT_SET = frozenset(p.lower() for p in EXIT_PHRASES)
 
 
 @dataclass(frozen=True)
@@ -29,20 +31,41 @@ class AgentContext:
     state: SessionState
 
 
-def build_context(docs_path: str = "./docs") -> AgentContext:
-    rag = RAGIndex()
-    rag.build_from_folder(docs_path)
+def build_context(docs_path: str = "./docs", cache_path: Optional[str] = "./.rag_cache") -> AgentContext:
+    rag = None
+    digest = docs_digest(docs_path)
+    if cache_path:
+        try:
+            rag = RAGIndex.load(cache_path, docs_digest=digest)
+        except Exception:
+            # Missing, stale or corrupt (truncated pickle, unreadable index, old
+            # format): all just mean a rebuild, never a failed start.
+            rag = None
+    if rag is None:
+        rag = RAGIndex()
+        rag.build_from_folder(docs_path)
+        if cache_path:
+            try:
+                rag.save(cache_path, docs_digest=digest)
+            except Exception:
+                pass
     state = SessionState()
     return AgentContext(rag=rag, state=state)
 
 
-def print_agent(text: str, title: str = "Agent") -> str:
+def print_agent(text: str, title: str = "Agent", rich: bool = True) -> str:
     cleaned = (text or "").strip()
     if cleaned:
-        console.print(Panel(cleaned, title=title))
+        if rich:
+            console.print(Panel(cleaned, title=title))
+        else:
+            sys.stdout.write(f"{title}: {cleaned}\n")
+            sys.stdout.flush()
     return cleaned
 
 
 def is_exit_phrase(user_text: str, phrases: Iterable[str] = EXIT_PHRASES) -> bool:
     t = (user_text or "").strip().lower()
+    if phrases is EXIT_PHRASES:
+        return t in _EXIT_SET
     return t in set(p.lower() for p in phrases)
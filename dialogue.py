@@ -1,16 +1,21 @@
+from __future__ import annotations
 import re
 import difflib
+import weakref
+from dataclasses import dataclass, field
+from functools import lru_cache
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
-from pydantic import BaseModel, Field
-from nlu import detect_intent, extract_entities
-from premium import calculate_premium
-from rag import DocChunk, RAGIndex
+from typing import TYPE_CHECKING, AbstractSet, Callable, Dict, Iterable, List, Optional, Tuple
 
+# nlu/premium/rag (and through them numpy, faiss) are imported where
+# they are first needed, so importing this module stays cheap.
+if TYPE_CHECKING:
+    import numpy as np
+    from rag import DocChunk, RAGIndex
 
-CURRENT_YEAR = datetime.now().year
-CANCEL_WORDS = {"cancel", "stop", "nevermind", "never mind"}
-EXIT_WORDS = {
+
+CANCEL_WORDS = frozenset({"cancel", "stop", "nevermind", "never mind"})
+EXIT_WORDS = frozenset({
     "hang up",
     "goodbye",
     "bye",
@@ -21,7 +26,10 @@ EXIT_WORDS = {
     "terminate",
     "close",
     "disconnect",
-}
+})
+_HUMAN_SET = frozenset({"human", "human agent", "call me back", "call back"})
+# Bare confirmations carry no entities; extract_entities is skipped for them.
+_TRIVIAL_INPUTS = frozenset({"yes", "yes please", "yeah", "yep", "y", "sure", "ok", "okay", "no", "nope", "nah", "n", "da", "ya"})
 
 _DIGIT_WORDS = {
     "zero": "0",
@@ -39,49 +47,115 @@ _DIGIT_WORDS = {
     "ate": "8",  
     "nine": "9",
 }
+_RE_TOKENS = re.compile(r"[a-zA-Z]+|\d+")
+# Any token the spoken-digit pass would expand (same letter-run boundaries as _RE_TOKENS).
+_RE_DIGIT_WORD = re.compile(
+    r"(?<![a-zA-Z])(?:" + "|".join(sorted([*_DIGIT_WORDS, "double", "triple"], key=len, reverse=True)) + r")(?![a-zA-Z])"
+)
+_RE_DATE = re.compile(r"\b(\d{4})-(\d{2})-(\d{2})\b")
+_RE_YES = re.compile(r"\b(yes|yeah|yep|y|sure|correct|ok)\b")
+_RE_NO = re.compile(r"\b(no|nope|nah|not)\b")
+_RE_REF = re.compile(r"\b(?:report|ref|reference|case)\s*#?\s*([A-Za-z0-9\-]+)\b", re.IGNORECASE)
+_RE_LOC = re.compile(r"\bin\s+([A-Za-zÀ-ž\- ]+?)(?:,\s*([A-Za-zÀ-ž\- ]+))?(?:[.!?]|$)", re.IGNORECASE)
+_RE_SENT_SPLIT = re.compile(r"(?<=[.!?])\s+")
+_WS_RE = re.compile(r"\s+")
+_RE_CLAUSE_SPLIT = re.compile(r"[,.!?;]")
+_RE_NON_WORD = re.compile(r"[^\w]+")
+_RE_ANY_DIGIT = re.compile(r"\d")
+_RE_AGE = re.compile(r"\bage\s*(is)?\s*(\d{1,2})\b")
+_RE_AGE_FULL = re.compile(r"\d{1,2}")
+_RE_ENGINE = re.compile(r"\b(\d(?:\.\d)?)\s*(l|liter|litre)\b")
+_RE_POLICY = re.compile(r"\b([A-Za-z0-9][A-Za-z0-9\-]{4,})\b")
+
+
+def _phrase_re(phrases: Iterable[str]) -> "re.Pattern[str]":
+    return re.compile("|".join(map(re.escape, phrases)))
+
+
+_INSURANCE_RE = _phrase_re([
+    "need insurance",
+    "want insurance",
+    "looking for insurance",
+    "get insurance",
+    "buy insurance",
+    "insurance for my car",
+])
+_PRICING_RE = _phrase_re(["pricing", "prcing", "price", "cost", "quote", "premium", "how much"])
+_CLAIM_POS_RE = _phrase_re(["claim", "claims", "claiming", "report", "reporting"])
+_CLAIM_NEG_RE = _phrase_re(["don't want to submit", "do not want to submit", "not submit", "not to submit", "just info", "information", "explain", "tell me"])
+_DISSAT_RE = _phrase_re([
+    "not precise",
+    "irrelevant",
+    "wrong",
+    "useless",
+    "stupid",
+    "idiot",
+    "you are not helping",
+    "what are you talking about",
+    "why you don't provide",
+    "why dont you provide",
+    "why don't answer",
+    "why dont answer",
+])
+_ACCIDENT_RE = _phrase_re(["accident", "crash", "collision", "rear-ended", "hit", "bumped"])
+_PLANS_RE = _phrase_re(["plans", "plan", "options", "offer", "coverage levels", "coverage level", "levels you offer"])
+_DIFF_RE = _phrase_re(["difference", "differences", "compare", "comparison", "what are the differences", "what is their differences"])
+_HOWMANY_RE = _phrase_re(["how many", "number of", "how many models", "how many plans", "how many options"])
+_CONFUSED_RE = _phrase_re(["what are you talking about", "huh", "doesn't make sense", "irrelevant"])
+_SHOPPING_RE = _phrase_re(["cheapest", "lowest", "option", "basic coverage", "liability", "minimum coverage"])
+_COMPARE_RE = _phrase_re(["difference", "compare", "comparison", "what is the difference"])
+_COVERAGE_TOPIC_RE = _phrase_re(["plans", "options", "coverage", "levels"])
+_DEDUCTIBLE_TOPIC_RE = _phrase_re(["deductible", "exclusion", "excluded", "not covered"])
+
 HUMAN_FALLBACK = (
     "I don't have enough information for more. "
     "You can say 'human agent' to be connected to our service center or check our website."
 )
 
 def _looks_like_insurance_request(t: str) -> bool:
-    return any(
-        p in t
-        for p in [
-            "need insurance",
-            "want insurance",
-            "looking for insurance",
-            "get insurance",
-            "buy insurance",
-            "insurance for my car",
-        ]
-    )
+    return bool(_INSURANCE_RE.search(t))
+
+_NON_DIGITS = "".join(c for c in map(chr, range(128)) if not c.isdigit())
+_KEEP_DIGITS = str.maketrans("", "", _NON_DIGITS)
+
+
+def _digits_only(s: str) -> str:
+    if s.isascii():
+        return s.translate(_KEEP_DIGITS)
+    return "".join(ch for ch in s if ch.isdigit())
+
 
 def _spoken_digits_to_string(text: str) -> str:
     t = (text or "").lower()
-    raw_digits = "".join(ch for ch in t if ch.isdigit())
-
-    tokens = re.findall(r"[a-zA-Z]+|\d+", t)
-    out = []
+    raw_digits = _digits_only(t)
+    # Policy numbers are usually dictated as digits already; the word pass is
+    # only skipped when there are no digit words that could add to them.
+    if len(raw_digits) >= 6 and not _RE_DIGIT_WORD.search(t):
+        return raw_digits
+
+    tokens = _RE_TOKENS.findall(t)
+    n = len(tokens)
+    get = _DIGIT_WORDS.get
+    out: List[str] = []
+    append = out.append
     i = 0
-    while i < len(tokens):
+    while i < n:
         tok = tokens[i]
         if tok.isdigit():
-            out.append(tok)
+            append(tok)
             i += 1
             continue
 
-        if tok in {"double", "triple"} and i + 1 < len(tokens):
-            nxt = tokens[i + 1]
-            d = _DIGIT_WORDS.get(nxt)
+        if tok in {"double", "triple"} and i + 1 < n:
+            d = get(tokens[i + 1])
             if d:
-                out.append(d * (2 if tok == "double" else 3))
+                append(d * (2 if tok == "double" else 3))
                 i += 2
                 continue
 
-        d = _DIGIT_WORDS.get(tok)
+        d = get(tok)
         if d:
-            out.append(d)
+            append(d)
         i += 1
 
     spoken = "".join(out)
@@ -91,53 +165,59 @@ def _spoken_digits_to_string(text: str) -> str:
 
 
 def _extract_policy_number(text: str) -> str:
-    s = _spoken_digits_to_string(text)
-    s = "".join(ch for ch in s if ch.isdigit())
+    s = _digits_only(_spoken_digits_to_string(text))
     return s if len(s) >= 6 else ""
 
 
-def _contains_any(text: str, phrases: set[str]) -> bool:
-    t = (text or "").lower()
+def _contains_any(t: str, phrases: AbstractSet[str]) -> bool:
     return any(p in t for p in phrases)
 
 
+_CITY_VARIANTS = {
+    "ljublajan": "Ljubljana",
+    "ljublijana": "Ljubljana",
+    "ljubljana": "Ljubljana",
+    "ljubljkana": "Ljubljana",
+    "leobliana": "Ljubljana",
+    "liubljana": "Ljubljana",
+    "lubljana": "Ljubljana",
+    "maribor": "Maribor",
+    "celje": "Celje",
+    "koper": "Koper",
+}
+# seq2 ("ljubljana") is analysed once here; each lookup only swaps in seq1.
+_LJ_MATCHER = difflib.SequenceMatcher(None, "", "ljubljana")
+
+
+def _fuzzy_ljubljana(c: str) -> bool:
+    _LJ_MATCHER.set_seq1(c)
+    return (
+        _LJ_MATCHER.real_quick_ratio() >= 0.75
+        and _LJ_MATCHER.quick_ratio() >= 0.75
+        and _LJ_MATCHER.ratio() >= 0.75
+    )
+
+
 def normalize_city(city: str) -> str:
     raw = (city or "").strip()
     c = raw.lower().strip()
     if not c:
         return raw
 
-    lj_variants = {
-        "ljublajan",
-        "ljublijana",
-        "ljubljana",
-        "ljubljkana",
-        "leobliana",
-        "liubljana",
-        "lubljana",
-    }
-    if c in lj_variants or "ljubl" in c:
+    hit = _CITY_VARIANTS.get(c)
+    if hit:
+        return hit
+    if "ljubl" in c or _fuzzy_ljubljana(c):
         return "Ljubljana"
 
-    if difflib.SequenceMatcher(None, c, "ljubljana").ratio() >= 0.75:
-        return "Ljubljana"
-
-    known = {
-        "maribor": "Maribor",
-        "celje": "Celje",
-        "koper": "Koper",
-    }
-    if c in known:
-        return known[c]
-    
     return raw.strip()
 
 
 def _first_sentence(text: str, max_len: int = 140) -> str:
-    t = " ".join((text or "").strip().split())
+    t = _WS_RE.sub(" ", text or "").strip()
     if not t:
         return ""
-    parts = re.split(r"(?<=[.!?])\s+", t)
+    parts = _RE_SENT_SPLIT.split(t)
     sent = parts[0] if parts else t
     if len(sent) > max_len:
         sent = sent[: max_len - 1].rstrip() + "…"
@@ -146,17 +226,67 @@ def _first_sentence(text: str, max_len: int = 140) -> str:
 
 def _is_bad_sentence(s: str) -> bool:
     s = (s or "").strip()
-    return len(s) < 12 or s in [".", "…"] or bool(re.fullmatch(r"[^\w]+", s))
+    return len(s) < 12 or s in [".", "…"] or bool(_RE_NON_WORD.fullmatch(s))
+
+
+class _RAGCache:
+    # Semantic cache in front of the vector search: a query whose embedding is
+    # within `threshold` cosine of a cached one reuses that query's chunks.
+    def __init__(self, capacity: int = 256, threshold: float = 0.95):
+        self.capacity = capacity
+        self.threshold = threshold
+        self.E: Optional[np.ndarray] = None  # (capacity, dim) float32, L2-normalized rows
+        self.docs: List[List[DocChunk]] = []
+        self._next = 0
+
+    def lookup(self, q: np.ndarray) -> Optional[List[DocChunk]]:
+        if not self.docs:
+            return None
+        sims = self.E[: len(self.docs)] @ q
+        i = int(sims.argmax())
+        return self.docs[i] if sims[i] >= self.threshold else None
+
+    def add(self, q: np.ndarray, docs: List[DocChunk]) -> None:
+        if self.E is None:
+            import numpy as np
+
+            self.E = np.empty((self.capacity, q.shape[0]), dtype=np.float32)
+        i = self._next
+        self.E[i] = q
+        if i < len(self.docs):
+            self.docs[i] = docs
+        else:
+            self.docs.append(docs)
+        self._next = (i + 1) % self.capacity
+
+
+_rag_caches: "weakref.WeakKeyDictionary[RAGIndex, Dict[int, _RAGCache]]" = weakref.WeakKeyDictionary()
+
+
+def _retrieve_cached(rag: RAGIndex, query: str, top_k: int) -> List[DocChunk]:
+    caches = _rag_caches.setdefault(rag, {})
+    cache = caches.get(top_k)
+    if cache is None:
+        cache = caches[top_k] = _RAGCache()
+
+    q = rag.embed_query(query)
+    docs = cache.lookup(q[0])
+    if docs is not None:
+        return docs
+
+    docs = rag.search(q, top_k)
+    # Only admit results that would actually produce a grounded answer.
+    if docs and docs[0].text and not _is_bad_sentence(_first_sentence(docs[0].text)):
+        cache.add(q[0], docs)
+    return docs
 
 
 def _looks_like_pricing(t: str) -> bool:
-    return any(k in t for k in ["pricing", "prcing", "price", "cost", "quote", "premium", "how much"])
+    return bool(_PRICING_RE.search(t))
 
 
 def _looks_like_claim_info_only(t: str) -> bool:
-    positives = ["claim", "claims", "claiming", "report", "reporting"]
-    negatives = ["don't want to submit", "do not want to submit", "not submit", "not to submit", "just info", "information", "explain", "tell me"]
-    return any(p in t for p in positives) and any(n in t for n in negatives)
+    return bool(_CLAIM_POS_RE.search(t) and _CLAIM_NEG_RE.search(t))
 
 
 COVERAGE_SUMMARY = {
@@ -177,81 +307,61 @@ def _coverage_difference_answer() -> str:
 
 
 def _is_dissatisfied(t: str) -> bool:
-    bad = [
-        "not precise",
-        "irrelevant",
-        "wrong",
-        "useless",
-        "stupid",
-        "idiot",
-        "you are not helping",
-        "what are you talking about",
-        "why you don't provide",
-        "why dont you provide",
-        "why don't answer",
-        "why dont answer",
-    ]
-    return any(b in t for b in bad)
-
-
-def _claim_missing_slots(slots: Dict) -> List[str]:
-    needed = [
-        "insurance_number",
-        "injuries",
-        "accident_city",
-        "accident_date",
-        "accident_description",
-        "police_report",
-        "vehicle_drivable",
-        "third_party_involved",
-    ]
-    return [k for k in needed if k not in slots]
+    return bool(_DISSAT_RE.search(t))
+
+
+_CLAIM_NEEDED = (
+    "insurance_number",
+    "injuries",
+    "accident_city",
+    "accident_date",
+    "accident_description",
+    "police_report",
+    "vehicle_drivable",
+    "third_party_involved",
+)
+
+
+def _first_missing_claim_slot(slots: Dict) -> Optional[str]:
+    return next((k for k in _CLAIM_NEEDED if k not in slots), None)
+
+
+_CLAIM_PROMPTS = {
+    "insurance_number": "What is your insurance/policy number? (You can read it as it appears on your policy card.)",
+    "injuries": "Were there any injuries? Please say yes or no.",
+    "accident_city": "Which city did the accident happen in?",
+    "accident_date": "What date did it happen? You can say 'today', 'yesterday', or a date like 2025-12-22.",
+    "accident_description": "Briefly, what happened? One sentence is enough.",
+    "police_report": "Was the police notified? Please say yes or no. If yes, do you have a report/reference number?",
+    "vehicle_drivable": "Is your car drivable right now? Please say yes or no.",
+    "third_party_involved": "Were other vehicles involved? Please say yes or no.",
+}
 
 
 def _ask_claim_question(missing_key: str) -> str:
-    if missing_key == "insurance_number":
-        return "What is your insurance/policy number? (You can read it as it appears on your policy card.)"
-    if missing_key == "injuries":
-        return "Were there any injuries? Please say yes or no."
-    if missing_key == "accident_city":
-        return "Which city did the accident happen in?"
-    if missing_key == "accident_date":
-        return "What date did it happen? You can say 'today', 'yesterday', or a date like 2025-12-22."
-    if missing_key == "accident_description":
-        return "Briefly, what happened? One sentence is enough."
-    if missing_key == "police_report":
-        return "Was the police notified? Please say yes or no. If yes, do you have a report/reference number?"
-    if missing_key == "vehicle_drivable":
-        return "Is your car drivable right now? Please say yes or no."
-    if missing_key == "third_party_involved":
-        return "Were other vehicles involved? Please say yes or no."
-    return "Can you tell me a bit more?"
-
-
-def _parse_yes_no(text: str) -> Optional[bool]:
-    t = (text or "").strip().lower()
+    return _CLAIM_PROMPTS.get(missing_key, "Can you tell me a bit more?")
+
 
+def _parse_yes_no(t: str) -> Optional[bool]:
     if t in ["np", "nop", "noo", "nahh"]:
         return False
 
-    if re.search(r"\b(no|nope|nah|not)\b", t):
+    if _RE_NO.search(t):
         return False
-    if re.search(r"\b(yes|yeah|yep|y|sure|correct|ok)\b", t):
+    if _RE_YES.search(t):
         return True
 
     return None
 
 
-def _parse_date(text: str) -> Optional[str]:
-    t = (text or "").strip().lower()
-    today = datetime.now()
+def _parse_date(t: str, today: datetime) -> Optional[str]:
 
     if "today" in t:
         return today.strftime("%Y-%m-%d")
     if "yesterday" in t:
         return (today - timedelta(days=1)).strftime("%Y-%m-%d")
 
-    m = re.search(r"\b(\d{4})-(\d{2})-(\d{2})\b", t)
+    m = _RE_DATE.search(t)
     if m:
         return f"{m.group(1)}-{m.group(2)}-{m.group(3)}"
     return None
@@ -259,11 +369,7 @@ def _parse_date(text: str) -> Optional[str]:
 
 def _extract_accident_location(text: str) -> Tuple[Optional[str], Optional[str]]:
     t = (text or "").strip()
-    m = re.search(
-        r"\bin\s+([A-Za-zÀ-ž\- ]+?)(?:,\s*([A-Za-zÀ-ž\- ]+))?(?:[.!?]|$)",
-        t,
-        flags=re.IGNORECASE,
-    )
+    m = _RE_LOC.search(t)
     if not m:
         return None, None
 
@@ -275,40 +381,34 @@ def _extract_accident_location(text: str) -> Tuple[Optional[str], Optional[str]]
     return None, normalize_city(part1)
 
 
-def _claim_update_from_text(user_text: str, slots: Dict) -> None:
-    tl = (user_text or "").lower().strip()
-
+def _claim_update_from_text(user_text: str, t: str, slots: Dict, now: datetime) -> None:
     area, city = _extract_accident_location(user_text)
     if city and "accident_city" not in slots:
         slots["accident_city"] = city
     if area and "accident_area" not in slots:
         slots["accident_area"] = area
 
-    d = _parse_date(user_text)
+    d = _parse_date(t, now)
     if d and "accident_date" not in slots:
         slots["accident_date"] = d
 
-    yn = _parse_yes_no(user_text)
+    yn = _parse_yes_no(t)
     if yn is None and len((user_text or "").strip()) > 8 and "accident_description" not in slots:
-        if any(w in tl for w in ["accident", "crash", "collision", "rear-ended", "hit", "bumped"]):
+        if _ACCIDENT_RE.search(t):
             slots["accident_description"] = (user_text or "").strip()
 
-    ref = re.search(
-        r"\b(?:report|ref|reference|case)\s*#?\s*([A-Za-z0-9\-]+)\b",
-        user_text or "",
-        flags=re.IGNORECASE,
-    )
+    ref = _RE_REF.search(user_text or "")
     if ref:
         slots["police_report_ref"] = ref.group(1)
 
 
-def _claim_apply_expected_answer(user_text: str, slots: Dict) -> None:
+def _claim_apply_expected_answer(user_text: str, t: str, slots: Dict, now: datetime) -> None:
     expected = slots.get("claim_expected")
     if not expected:
         return
 
-    yn = _parse_yes_no(user_text)
-    d = _parse_date(user_text)
+    yn = _parse_yes_no(t)
+    d = _parse_date(t, now)
 
     if expected in ["injuries", "vehicle_drivable", "third_party_involved"]:
         if yn is not None:
@@ -320,11 +420,7 @@ def _claim_apply_expected_answer(user_text: str, slots: Dict) -> None:
         if yn is not None:
             slots["police_report"] = yn
             if yn is True:
-                ref = re.search(
-                    r"\b(?:report|ref|reference|case)\s*#?\s*([A-Za-z0-9\-]+)\b",
-                    user_text or "",
-                    flags=re.IGNORECASE,
-                )
+                ref = _RE_REF.search(user_text or "")
                 if ref:
                     slots["police_report_ref"] = ref.group(1)
             slots.pop("claim_expected", None)
@@ -339,8 +435,8 @@ def _claim_apply_expected_answer(user_text: str, slots: Dict) -> None:
     if expected == "accident_city":
         area, city = _extract_accident_location(user_text)
         if not city:
-            candidate = re.split(r"[,.!?;]", (user_text or "").strip())[0].strip()
-            if 2 <= len(candidate) <= 40 and not re.search(r"\d", candidate):
+            candidate = _RE_CLAUSE_SPLIT.split((user_text or "").strip())[0].strip()
+            if 2 <= len(candidate) <= 40 and not _RE_ANY_DIGIT.search(candidate):
                 city = normalize_city(candidate)
         if city:
             slots["accident_city"] = city
@@ -358,7 +454,7 @@ def _claim_apply_expected_answer(user_text: str, slots: Dict) -> None:
             slots.pop("claim_expected", None)
             return
 
-        m = re.search(r"\b([A-Za-z0-9][A-Za-z0-9\-]{4,})\b", txt)
+        m = _RE_POLICY.search(txt)
         if m:
             slots["insurance_number"] = m.group(1)
             slots.pop("claim_expected", None)
@@ -373,8 +469,7 @@ def _claim_apply_expected_answer(user_text: str, slots: Dict) -> None:
 
 
 
-def _generate_claim_number(state) -> str:
-    now = datetime.now()
+def _generate_claim_number(state, now: datetime) -> str:
     yyyymm = now.strftime("%Y%m")
 
     counters = state.slots.get("claim_counters", {})
@@ -389,56 +484,106 @@ def _generate_claim_number(state) -> str:
 
 
 def estimate_hp_from_engine_size(engine_size_l: float) -> Tuple[int, str]:
-    if engine_size_l <= 1.0:
-        return 95, "estimated from engine size"
-    if engine_size_l <= 1.2:
-        return 105, "estimated from engine size"
-    if engine_size_l <= 1.4:
-        return 120, "estimated from engine size"
-    if engine_size_l <= 1.6:
-        return 135, "estimated from engine size"
-    if engine_size_l <= 1.8:
-        return 155, "estimated from engine size"
-    if engine_size_l <= 2.0:
-        return 180, "estimated from engine size"
-    return 200, "estimated from engine size"
-
-
-class SessionState(BaseModel):
-    slots: Dict[str, object] = Field(default_factory=dict)
+    from premium import estimate_horsepower_from_engine_size
+    return estimate_horsepower_from_engine_size(engine_size_l)
+
+
+@dataclass(slots=True)
+class SessionState:
+    slots: Dict[str, object] = field(default_factory=dict)
     last_intent: Optional[str] = None
     turns: int = 0
 
 
-class TurnResult(BaseModel):
+@dataclass(slots=True)
+class TurnResult:
     response_text: str
     end_call: bool = False
 
 
-def _missing_premium_slots(slots: Dict) -> List[str]:
-    needed = ["vehicle_age", "horsepower", "city", "coverage_level"]
-    return [k for k in needed if k not in slots]
+_PREMIUM_NEEDED = ("vehicle_age", "horsepower", "city", "coverage_level")
+
 
+def _first_missing_premium_slot(slots: Dict) -> Optional[str]:
+    return next((k for k in _PREMIUM_NEEDED if k not in slots), None)
 
-def _ask_one_missing(missing: List[str], slots: Dict) -> str:
-    if not missing:
+
+_PREMIUM_PROMPTS = {
+    "vehicle_age": "What’s the vehicle year (e.g., 2010) or age in years?",
+    "horsepower": "About how many horsepower is the vehicle? If you don’t know, tell me engine size (e.g., 1.4 / 1.6).",
+    "city": "Which city is the vehicle primarily used in?",
+    "coverage_level": "Do you want basic, standard, or premium coverage?",
+}
+
+
+# Slot prompts spoken verbatim, so a voice front end can pre-render them.
+CANNED_PROMPTS: Tuple[str, ...] = (*_CLAIM_PROMPTS.values(), *_PREMIUM_PROMPTS.values())
+
+
+def _ask_one_missing(k: Optional[str], slots: Dict) -> str:
+    if not k:
         return "What detail should we adjust?"
-    k = missing[0]
-    if k == "vehicle_age":
-        return "What’s the vehicle year (e.g., 2010) or age in years?"
-    if k == "horsepower":
-        if "engine_size_l" in slots:
-            return "I can estimate horsepower from engine size—do you want that, or do you know the exact HP?"
-        return "About how many horsepower is the vehicle? If you don’t know, tell me engine size (e.g., 1.4 / 1.6)."
-    if k == "city":
-        return "Which city is the vehicle primarily used in?"
-    if k == "coverage_level":
-        return "Do you want basic, standard, or premium coverage?"
-    return f"Could you tell me {k}?"
-
-
-def _qa_answer_or_followup(user_text: str, docs: List[DocChunk], state: "SessionState") -> str:
-    t = (user_text or "").lower().strip()
+    if k == "horsepower" and "engine_size_l" in slots:
+        return "I can estimate horsepower from engine size—do you want that, or do you know the exact HP?"
+    prompt = _PREMIUM_PROMPTS.get(k)
+    return prompt if prompt is not None else f"Could you tell me {k}?"
+
+
+# QA handlers: (t, state, retrieve, website) -> reply. The "type human" hint
+# is appended by _qa_answer_or_followup for routes that allow it.
+_QaHandler = Callable[[str, "SessionState", Callable[[], List["DocChunk"]], str], str]
+
+
+def _qa_insurance_request(t: str, state: "SessionState", retrieve: Callable[[], List[DocChunk]], website: str) -> str:
+    state.slots["force_intent"] = "premium_estimate"
+    return "Sure — I can help you get car insurance. Let’s start with the vehicle year."
+
+
+def _qa_claim_info(t: str, state: "SessionState", retrieve: Callable[[], List[DocChunk]], website: str) -> str:
+    docs = retrieve() or []
+    best = docs[0] if docs else None
+    candidate = _first_sentence(best.text, max_len=140) if (best and best.text) else ""
+    base = candidate if not _is_bad_sentence(candidate) else "Claims info: you can report online/phone, then provide incident details and evidence."
+    return f"{base}{website} What part of claims do you want (steps, documents, timelines, or coverage)?"
+
+
+def _qa_pricing(t: str, state: "SessionState", retrieve: Callable[[], List[DocChunk]], website: str) -> str:
+    state.slots["force_intent"] = "premium_estimate"
+    if "vehicle_age" not in state.slots and "vehicle_year" not in state.slots:
+        return "Sure — I can estimate pricing. What’s the vehicle year (e.g., 2010)?"
+    missing = _first_missing_premium_slot(state.slots)
+    return f"Sure — I can estimate pricing. {_ask_one_missing(missing, state.slots)}"
+
+
+def _qa_plans(t: str, state: "SessionState", retrieve: Callable[[], List[DocChunk]], website: str) -> str:
+    return f"We offer 3 coverage levels: Basic, Standard, and Premium.{website} Want the differences between them?"
+
+
+def _qa_differences(t: str, state: "SessionState", retrieve: Callable[[], List[DocChunk]], website: str) -> str:
+    return _coverage_difference_answer()
+
+
+def _qa_how_many(t: str, state: "SessionState", retrieve: Callable[[], List[DocChunk]], website: str) -> str:
+    return "We offer 3 options (Basic, Standard, Premium). Do you want the cheapest or the most coverage?"
+
+
+def _qa_confused(t: str, state: "SessionState", retrieve: Callable[[], List[DocChunk]], website: str) -> str:
+    return "Got it — are you asking about coverage levels, pricing, or claim reporting?"
+
+
+# (predicate, handler, offer_human); first match wins, so order is priority.
+_QA_ROUTES: List[Tuple[Callable[[str], object], _QaHandler, bool]] = [
+    (_looks_like_insurance_request, _qa_insurance_request, False),
+    (_looks_like_claim_info_only, _qa_claim_info, True),
+    (_looks_like_pricing, _qa_pricing, True),
+    (_PLANS_RE.search, _qa_plans, True),
+    (_DIFF_RE.search, _qa_differences, True),
+    (_HOWMANY_RE.search, _qa_how_many, True),
+    (_CONFUSED_RE.search, _qa_confused, True),
+]
+
+
+def _qa_answer_or_followup(t: str, retrieve: Callable[[], List[DocChunk]], state: "SessionState") -> str:
     state.slots["qa_turns"] = int(state.slots.get("qa_turns", 0)) + 1
     if _is_dissatisfied(t):
         state.slots["qa_frustration"] = int(state.slots.get("qa_frustration", 0)) + 1
@@ -448,43 +593,18 @@ def _qa_answer_or_followup(user_text: str, docs: List[DocChunk], state: "Session
     qa_turns = int(state.slots["qa_turns"])
     fr = int(state.slots.get("qa_frustration", 0))
 
-    
     website = " You can also review details on our website for the full wording." if qa_turns == 1 else ""
     human = " If you’d rather speak to a person, type human." if (qa_turns >= 5 and fr >= 2) else ""
 
-    if _looks_like_insurance_request(t):
-        state.slots["force_intent"] = "premium_estimate"
-        return "Sure — I can help you get car insurance. Let’s start with the vehicle year."
-
-
-    if _looks_like_claim_info_only(t):
-        docs = docs or []
-        best = docs[0] if docs else None
-        candidate = _first_sentence(best.text, max_len=140) if (best and best.text) else ""
-        base = candidate if not _is_bad_sentence(candidate) else "Claims info: you can report online/phone, then provide incident details and evidence."
-        return f"{base}{website} What part of claims do you want (steps, documents, timelines, or coverage)?{human}"
-
-    if _looks_like_pricing(t):
-        state.slots["force_intent"] = "premium_estimate"
-        if "vehicle_age" not in state.slots and "vehicle_year" not in state.slots:
-            return f"Sure — I can estimate pricing. What’s the vehicle year (e.g., 2010)?{human}"
-        missing = _missing_premium_slots(state.slots)
-        return f"Sure — I can estimate pricing. {_ask_one_missing(missing, state.slots)}{human}"
-
-    if any(p in t for p in ["plans", "plan", "options", "offer", "coverage levels", "coverage level", "levels you offer"]):
-        return f"We offer 3 coverage levels: Basic, Standard, and Premium.{website} Want the differences between them?{human}"
-
-    if any(p in t for p in ["difference", "differences", "compare", "comparison", "what are the differences", "what is their differences"]):
-        return _coverage_difference_answer() + human
+    for matches, handler, offer_human in _QA_ROUTES:
+        if matches(t):
+            reply = handler(t, state, retrieve, website)
+            return reply + human if offer_human else reply
 
-    if any(p in t for p in ["how many", "number of", "how many models", "how many plans", "how many options"]):
-        return f"We offer 3 options (Basic, Standard, Premium). Do you want the cheapest or the most coverage?{human}"
-
-    if any(p in t for p in ["what are you talking about", "huh", "doesn't make sense", "irrelevant"]):
-        return f"Got it — are you asking about coverage levels, pricing, or claim reporting?{human}"
+    docs = retrieve()
     if not docs or not docs[0].text:
         return HUMAN_FALLBACK
-    
+
     best = docs[0] if docs else None
     candidate = _first_sentence(best.text, max_len=140) if (best and best.text) else ""
     base = candidate if not _is_bad_sentence(candidate) else "I can answer that, but I need one detail first."
@@ -501,9 +621,54 @@ def _qa_answer_or_followup(user_text: str, docs: List[DocChunk], state: "Session
     return f"{base}{website} {follow}{human}"
 
 
+@lru_cache(maxsize=512)
+def _route(
+    t: str,
+    last_intent: Optional[str],
+    forced: Optional[str],
+    in_claim_intake: bool,
+    premium_ready: bool,
+) -> Tuple[str, float, bool]:
+    # Pure function of the lowercased text and the few state bits that steer
+    # routing, so repeated short turns ("yes", "ok", "compare") skip NLU.
+    cancel_claim = False
+    if forced:
+        intent, confidence = forced, 0.99
+    else:
+        from nlu import detect_intent
+
+        res = detect_intent(t, last_intent=last_intent)
+        intent, confidence = res.intent, res.confidence
+
+    if in_claim_intake:
+        if _contains_any(t, CANCEL_WORDS):
+            cancel_claim = True
+            intent, confidence = "doc_qa", 0.6
+        else:
+            intent, confidence = "report_claim", 0.95
+
+    if intent == "doc_qa" and _SHOPPING_RE.search(t):
+        intent, confidence = "premium_estimate", max(confidence, 0.8)
+
+    if intent == "report_claim" and _looks_like_claim_info_only(t):
+        intent, confidence = "doc_qa", 0.85
+
+    if intent == "doc_qa" and t in ["yes", "yes please", "ok", "okay", "sure", "da", "ya"]:
+        if last_intent == "premium_estimate":
+            intent = "compare_coverage" if premium_ready else "premium_estimate"
+            confidence = 0.9
+
+    if last_intent == "premium_estimate" and intent == "doc_qa":
+        intent, confidence = "premium_estimate", max(confidence, 0.75)
+
+    return intent, confidence, cancel_claim
+
+
 def dialogue_manager(user_text: str, state: SessionState, rag: RAGIndex) -> TurnResult:
     state.turns += 1
     t = (user_text or "").lower().strip()
+    # One clock read per turn: date parsing, vehicle age and claim numbers share it.
+    now = datetime.now()
 
     # Global exit: user can always end call
     if _contains_any(t, EXIT_WORDS):
@@ -512,8 +677,10 @@ def dialogue_manager(user_text: str, state: SessionState, rag: RAGIndex) -> Turn
         state.slots.pop("claim_expected", None)
         return TurnResult(response_text="Okay — ending the call. Goodbye!", end_call=True)
 
-    ents = extract_entities(user_text, existing_slots=state.slots)
-    state.slots.update(ents)
+    if t not in _TRIVIAL_INPUTS:
+        from nlu import extract_entities
+
+        state.slots.update(extract_entities(user_text, existing_slots=state.slots))
 
     if "city" in state.slots:
         state.slots["city"] = normalize_city(str(state.slots["city"]))
@@ -521,89 +688,57 @@ def dialogue_manager(user_text: str, state: SessionState, rag: RAGIndex) -> Turn
     if "vehicle_year" in state.slots:
         try:
             y = int(state.slots["vehicle_year"])
-            if 1950 <= y <= CURRENT_YEAR:
-                state.slots["vehicle_age"] = CURRENT_YEAR - y
+            if 1950 <= y <= now.year:
+                state.slots["vehicle_age"] = now.year - y
         except Exception:
             pass
 
     if "vehicle_age" not in state.slots:
-        m = re.search(r"\bage\s*(is)?\s*(\d{1,2})\b", t)
+        m = _RE_AGE.search(t)
         if m:
             state.slots["vehicle_age"] = int(m.group(2))
-        elif re.fullmatch(r"\d{1,2}", t):
+        elif _RE_AGE_FULL.fullmatch(t):
             age = int(t)
             if 0 < age < 100 and state.last_intent == "premium_estimate":
                 state.slots["vehicle_age"] = age
 
 
-    intent_res = detect_intent(user_text, last_intent=state.last_intent)
-
     forced = state.slots.pop("force_intent", None)
-    if forced:
-        intent_res.intent = forced
-        intent_res.confidence = 0.99
+    in_claim_intake = bool(state.slots.get("in_claim_intake"))
+    premium_ready = _first_missing_premium_slot(state.slots) is None
 
-    if state.slots.get("in_claim_intake"):
-        if _contains_any(t, CANCEL_WORDS):
-            state.slots["in_claim_intake"] = False
-            state.slots.pop("claim_expected", None)
-            intent_res.intent = "doc_qa"
-            intent_res.confidence = 0.6
-        else:
-            intent_res.intent = "report_claim"
-            intent_res.confidence = 0.95
-
-    shopping_signals = ["cheapest", "lowest", "option", "basic coverage", "liability", "minimum coverage"]
-    if intent_res.intent == "doc_qa" and any(s in t for s in shopping_signals):
-        intent_res.intent = "premium_estimate"
-        intent_res.confidence = max(intent_res.confidence, 0.8)
-
-    if intent_res.intent == "report_claim" and _looks_like_claim_info_only(t):
-        intent_res.intent = "doc_qa"
-        intent_res.confidence = 0.85
-
-    if intent_res.intent == "doc_qa" and t in ["yes", "yes please", "ok", "okay", "sure", "da", "ya"]:
-        if state.last_intent == "premium_estimate":
-            if not _missing_premium_slots(state.slots):
-                intent_res.intent = "compare_coverage"
-                intent_res.confidence = 0.9
-            else:
-
-                intent_res.intent = "premium_estimate"
-                intent_res.confidence = 0.9
-
-    if state.last_intent == "premium_estimate" and intent_res.intent == "doc_qa":
-        intent_res.intent = "premium_estimate"
-        intent_res.confidence = max(intent_res.confidence, 0.75)
+    intent, _confidence, cancel_claim = _route(t, state.last_intent, forced, in_claim_intake, premium_ready)
+    if cancel_claim:
+        state.slots["in_claim_intake"] = False
+        state.slots.pop("claim_expected", None)
 
 
-    if intent_res.intent != "doc_qa":
+    if intent != "doc_qa":
         state.slots["qa_turns"] = 0
 
-    state.last_intent = intent_res.intent
+    state.last_intent = intent
 
 
-    if intent_res.intent == "handoff_human" or _contains_any(t, {"human", "human agent", "call me back", "call back"}):
+    if intent == "handoff_human" or _contains_any(t, _HUMAN_SET):
         return TurnResult(
             response_text="Okay — I’m transferring you to a human agent now. (Prototype: transfer simulated.)",
             end_call=True,
         )
 
 
-    if intent_res.intent == "report_claim":
+    if intent == "report_claim":
         state.slots["in_claim_intake"] = True
 
-        _claim_update_from_text(user_text, state.slots)
-        _claim_apply_expected_answer(user_text, state.slots)
+        _claim_update_from_text(user_text, t, state.slots, now)
+        _claim_apply_expected_answer(user_text, t, state.slots, now)
 
 
-        missing = _claim_missing_slots(state.slots)
-        if missing:
-            next_key = missing[0]
+        next_key = _first_missing_claim_slot(state.slots)
+        if next_key:
             state.slots["claim_expected"] = next_key
             return TurnResult(response_text=_ask_claim_question(next_key))
 
-        claim_no = _generate_claim_number(state)
+        claim_no = _generate_claim_number(state, now)
         state.slots["claim_number"] = claim_no
         state.slots["in_claim_intake"] = False
         state.slots.pop("claim_expected", None)
@@ -627,7 +762,7 @@ def dialogue_manager(user_text: str, state: SessionState, rag: RAGIndex) -> Turn
             end_call=False,
         )
 
-    if intent_res.intent == "premium_estimate":
+    if intent == "premium_estimate":
         if "coverage_level" not in state.slots and "cheapest" in t:
             state.slots["coverage_level"] = "basic"
 
@@ -642,15 +777,17 @@ def dialogue_manager(user_text: str, state: SessionState, rag: RAGIndex) -> Turn
             except Exception:
                 pass
 
-        missing = _missing_premium_slots(state.slots)
+        missing = _first_missing_premium_slot(state.slots)
         if missing:
             return TurnResult(response_text= hp_note + _ask_one_missing(missing, state.slots))
 
         if "engine_size_l" not in state.slots:
-            m = re.search(r"\b(\d(?:\.\d)?)\s*(l|liter|litre)\b", t)
+            m = _RE_ENGINE.search(t)
             if m:
                 state.slots["engine_size_l"] = float(m.group(1))
 
+        from premium import calculate_premium
+
         res = calculate_premium(
             vehicle_age=int(state.slots["vehicle_age"]),
             horsepower=int(state.slots["horsepower"]),
@@ -668,27 +805,24 @@ def dialogue_manager(user_text: str, state: SessionState, rag: RAGIndex) -> Turn
         )
 
     if state.last_intent == "premium_estimate" and "coverage_level" not in state.slots:
-        if any(w in t for w in ["difference", "compare", "comparison", "what is the difference"]):
+        if _COMPARE_RE.search(t):
             return TurnResult(response_text=_coverage_difference_answer(), end_call=False)
 
-    if state.last_intent in {"premium_estimate", "compare_coverage"} and intent_res.intent == "doc_qa":
+    if state.last_intent in {"premium_estimate", "compare_coverage"} and intent == "doc_qa":
         return TurnResult(response_text="Do you want to pick a coverage level (basic/standard/premium), or get a new quote with different details?", end_call=False,)
         
 
-    if intent_res.intent == "compare_coverage":
-        missing = _missing_premium_slots(state.slots)
-        if missing:
+    if intent == "compare_coverage":
+        if _first_missing_premium_slot(state.slots):
             return TurnResult(response_text=_coverage_difference_answer())
 
-        base_args = dict(
+        from premium import calculate_premium_all_levels
+
+        results = calculate_premium_all_levels(
             vehicle_age=int(state.slots["vehicle_age"]),
             horsepower=int(state.slots["horsepower"]),
             city=str(state.slots["city"]),
         )
-        results = {}
-        for level in ["basic", "standard", "premium"]:
-            res = calculate_premium(coverage_level=level, **base_args)
-            results[level] = res.monthly_eur
 
         return TurnResult(
             response_text=(
@@ -702,12 +836,13 @@ def dialogue_manager(user_text: str, state: SessionState, rag: RAGIndex) -> Turn
         )
 
     rag_query = user_text
-    if any(w in t for w in ["plans", "options", "coverage", "levels"]):
+    if _COVERAGE_TOPIC_RE.search(t):
         rag_query = "auto insurance coverage levels basic standard premium differences"
     elif "claim" in t:
         rag_query = "auto claim process steps required information evidence timeline"
-    elif any(w in t for w in ["deductible", "exclusion", "excluded", "not covered"]):
+    elif _DEDUCTIBLE_TOPIC_RE.search(t):
         rag_query = user_text 
 
-    docs = rag.retrieve(rag_query, top_k=3)
-    return TurnResult(response_text=_qa_answer_or_followup(user_text, docs, state), end_call=False)
+    # Retrieval is deferred: canned replies in _qa_answer_or_followup never pay for it.
+    answer = _qa_answer_or_followup(t, lambda: _retrieve_cached(rag, rag_query, top_k=3), state)
+    return TurnResult(response_text=answer, end_call=False)
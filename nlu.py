@@ -1,19 +1,30 @@
 import re
-from pydantic import BaseModel
-from typing import Dict, Literal, Optional
+from functools import lru_cache
+from typing import Dict, FrozenSet, Literal, NamedTuple, Optional, Set, Tuple
 
 Intent = Literal["doc_qa", "report_claim", "premium_estimate", "clarification", "handoff_human", "compare_coverage"]
 
-class IntentResult(BaseModel):
+class IntentResult(NamedTuple):
+    # Immutable, so detect_intent can hand out cached instances.
     intent: Intent
     confidence: float
 
+    def model_dump(self) -> Dict[str, object]:
+        return self._asdict()
+
 COVERAGE_ALIASES = {
     "basic": ["basic", "minimum", "liability", "low", "budget", "economy", "starter", "cheapest"],
     "standard": ["standard", "normal", "regular", "medium", "typical", "mid-tier", "moderate"],
     "premium": ["premium", "full", "comprehensive", "high", "best", "top-tier", "ultimate"],
 }
 
+# One alternation per level, tried in level order: the first level with any
+# alias anywhere in the text wins, exactly as the per-word substring checks did.
+_COVERAGE_RES = [
+    (level, re.compile("|".join(map(re.escape, words))))
+    for level, words in COVERAGE_ALIASES.items()
+]
+
 keywords = {
     "doc_qa": ["what is", "tell me about", "information on", "details about", "explain", "how to"],
     "report_claim": ["report a claim", "file a claim", "accident", "crash", "stolen", "theft", "claim"],
@@ -27,30 +38,63 @@ keywords = {
 
 }
 
+# All keywords in one scan, Aho-Corasick style. The zero-width lookahead
+# reports a match at every position; longest-first ordering makes it the
+# longest keyword starting there, and every other keyword starting there is
+# a prefix of it, so each keyword carries the intents of all its prefixes.
+_ALL_KEYWORDS = sorted({kw for kws in keywords.values() for kw in kws}, key=len, reverse=True)
+_KEYWORD_INTENTS: Dict[str, FrozenSet[str]] = {
+    kw: frozenset(label for label, kws in keywords.items() if any(kw.startswith(k) for k in kws))
+    for kw in _ALL_KEYWORDS
+}
+_KEYWORD_SCAN = re.compile("(?=(" + "|".join(map(re.escape, _ALL_KEYWORDS)) + "))")
+
+
+def _matched_intents(t: str) -> Set[str]:
+    hits: Set[str] = set()
+    for m in _KEYWORD_SCAN.finditer(t):
+        hits |= _KEYWORD_INTENTS[m.group(1)]
+    return hits
+
+
 def detect_intent(user_text: str, last_intent: Optional[str] = None) -> IntentResult:
-    t = user_text.lower().strip()
+    return _detect_cached(user_text.lower().strip(), last_intent)
 
-    if last_intent == "premium_estimate" and any(k in t for k in keywords["premium_estimate"]):
+
+@lru_cache(maxsize=512)
+def _detect_cached(t: str, last_intent: Optional[str]) -> IntentResult:
+    hits = _matched_intents(t)
+
+    if last_intent == "premium_estimate" and "premium_estimate" in hits:
         return IntentResult(intent="premium_estimate", confidence=0.85)
 
-    if any(k in t for k in keywords["compare_coverage"]):
+    if "compare_coverage" in hits:
         return IntentResult(intent="compare_coverage", confidence=0.9)
 
 
-    if any(k in t for k in keywords["premium_estimate"]):
+    if "premium_estimate" in hits:
         return IntentResult(intent="premium_estimate", confidence=0.8)
 
-    if any(k in t for k in keywords["report_claim"]):
+    if "report_claim" in hits:
         return IntentResult(intent="report_claim", confidence=0.8)
 
-    if any(k in t for k in keywords["handoff_human"]):
+    if "handoff_human" in hits:
         return IntentResult(intent="handoff_human", confidence=0.7)
 
     return IntentResult(intent="doc_qa", confidence=0.6)
 
 
-def _extract_int(pattern: str, text: str) -> Optional[int]:
-    m = re.search(pattern, text, flags=re.IGNORECASE)
+_HP_RE = re.compile(r"(\d+)\s*(?:hp|horsepower)", re.IGNORECASE)
+_ENGINE_RE = re.compile(r"\b(?:engine\s*size\s*(?:is|=)\s*)?(\d\.\d)\s*(?:l|litre|liter)?\b")
+_CITY_RE = re.compile(r"\b(?:in|city)\s+([A-Za-zÀ-ž\- ]{2,})")
+_CITY_SPLIT_RE = re.compile(r"[,.!?;]")
+_YEAR_RE = re.compile(r"\b(19[5-9]\d|20[0-2]\d)\b")
+_BARE_RE = re.compile(r"^\s*(\d{1,4})\s*$")
+_AGE_RE = re.compile(r"(\d+)\s*(?:year|yr)[s]?\s*(?:old)?", re.IGNORECASE)
+
+
+def _extract_int(pattern: "re.Pattern[str]", text: str) -> Optional[int]:
+    m = pattern.search(text)
     if not m:
         return None
     try:
@@ -59,24 +103,29 @@ def _extract_int(pattern: str, text: str) -> Optional[int]:
         return None
 
 def extract_entities(user_text: str, existing_slots: Optional[Dict] = None) -> Dict:
-    existing_slots = existing_slots or {}
-    t = user_text.strip()
+    # Extraction depends only on the text (existing_slots is accepted for API
+    # compatibility), so results are memoized and a fresh dict is returned.
+    return dict(_extract_cached(user_text.strip()))
+
+
+@lru_cache(maxsize=512)
+def _extract_cached(t: str) -> Tuple[Tuple[str, object], ...]:
     tl = t.lower()
 
     out: Dict = {}
 
-    for level, words in COVERAGE_ALIASES.items():
-        if any(w in tl for w in words):
+    for level, pattern in _COVERAGE_RES:
+        if pattern.search(tl):
             out["coverage_level"] = level
             break
 
 
-    hp = _extract_int(r"(\d+)\s*(?:hp|horsepower)", t)
+    hp = _extract_int(_HP_RE, t)
     if hp is not None:
         out["horsepower"] = hp
 
 
-    m = re.search(r"\b(?:engine\s*size\s*(?:is|=)\s*)?(\d\.\d)\s*(?:l|litre|liter)?\b", tl)
+    m = _ENGINE_RE.search(tl)
     if m:
         try:
             es = float(m.group(1))
@@ -86,28 +135,28 @@ def extract_entities(user_text: str, existing_slots: Optional[Dict] = None) -> D
             pass
 
 
-    m = re.search(r"\b(?:in|city)\s+([A-Za-zÀ-ž\- ]{2,})", t)
+    m = _CITY_RE.search(t)
     if m:
-        city = re.split(r"[,.!?;]", m.group(1).strip())[0].strip()
+        city = _CITY_SPLIT_RE.split(m.group(1).strip(), 1)[0].strip()
         if city.lower() in ["ljublajan", "ljublijana", "ljubljana"]:
             city = "Ljubljana"
         out["city"] = city
 
-    m = re.search(r"\b(19[5-9]\d|20[0-2]\d)\b", tl)
+    m = _YEAR_RE.search(tl)
     if m:
         out["vehicle_year"] = int(m.group(1))
 
 
 
-    bare_number = _extract_int(r"^\s*(\d{1,4})\s*$", t)
+    bare_number = _extract_int(_BARE_RE, t)
     if bare_number is not None:
         if 1950 <= bare_number <= 2025:
             out["vehicle_year"] = bare_number
         elif 0 < bare_number <= 60:
             out["vehicle_age"] = bare_number
 
-    age = _extract_int(r"(\d+)\s*(?:year|yr)[s]?\s*(?:old)?", t)
+    age = _extract_int(_AGE_RE, t)
     if age is not None:
         out["vehicle_age"] = age
 
-    return out
+    return tuple(out.items())
@@ -1,59 +1,80 @@
-from pydantic import BaseModel, Field
-from typing import Literal, Dict, Tuple
+from bisect import bisect_left
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Literal, Dict, Mapping, NamedTuple, Tuple
 
 CoverageLevel = Literal["basic", "standard", "premium"]
 
-class PremiumResult(BaseModel):
+class PremiumResult(NamedTuple):
     monthly_eur: float
-    breakdown: Dict[str, float]
+    breakdown: Mapping[str, float]
+
+    def model_dump(self) -> Dict[str, object]:
+        return {"monthly_eur": self.monthly_eur, "breakdown": dict(self.breakdown)}
+
+
+# Upper engine-size bound (litres, inclusive) of each horsepower band; the last band is open-ended.
+_ES_THRESH = (1.0, 1.2, 1.4, 1.6, 1.8, 2.0)
+_HP_TABLE = (95, 105, 120, 135, 155, 180, 200)
 
 
 def estimate_horsepower_from_engine_size(engine_size_l: float) -> Tuple[int, str]:
+    # bisect_left lands a value equal to a bound in that bound's band, i.e. "<=".
+    return (_HP_TABLE[bisect_left(_ES_THRESH, engine_size_l)], "estimated from engine size")
 
-    if engine_size_l <= 1.0:
-        return (95, "estimated from engine size")
-    if engine_size_l <= 1.2:
-        return (105, "estimated from engine size")
-    if engine_size_l <= 1.4:
-        return (120, "estimated from engine size")
-    if engine_size_l <= 1.6:
-        return (135, "estimated from engine size")
-    if engine_size_l <= 1.8:
-        return (155, "estimated from engine size")
-    if engine_size_l <= 2.0:
-        return (180, "estimated from engine size")
-    return (200, "estimated from engine size")
 
+_CITY_FACTOR = {
+    "ljubljana": 1.20,
+    "maribor": 1.15,
+    "celje": 1.10,
+    "koper": 1.05,
+}
 
-def calculate_premium(vehicle_age: int, horsepower: int, city: str, coverage_level: CoverageLevel) -> PremiumResult:
+_COVERAGE_FACTOR = {
+    "basic": 0.80,
+    "standard": 0.90,
+    "premium": 1.0
+}
+
+
+def _factors(vehicle_age: int, horsepower: int, city: str) -> Tuple[float, float, float, float]:
     base = 25.0
     age_factor = 1.0 + max(0, vehicle_age - 3) * 0.05  # +5% per year after 3
     power_factor = 1.0 + max(0, horsepower - 80) * 0.01  # +1% per HP after 80
+    city_factor = _CITY_FACTOR.get(city.strip().lower(), 1.04)
+    return base, age_factor, power_factor, city_factor
 
 
-    city_norm = city.strip().lower()
-    city_factor_map = {
-        "ljubljana": 1.20,
-        "maribor": 1.15,
-        "celje": 1.10,
-        "koper": 1.05,
-    }
-    city_factor = city_factor_map.get(city_norm, 1.04)
+def calculate_premium(vehicle_age: int, horsepower: int, city: str, coverage_level: CoverageLevel) -> PremiumResult:
+    return _premium_cached(vehicle_age, horsepower, city.strip().lower(), coverage_level)
+
 
-    coverage_factor_map = {
-        "basic": 0.80,
-        "standard": 0.90,
-        "premium": 1
-    }
-    coverage_factor = coverage_factor_map[coverage_level]
+# Sessions re-quote the same car as the user confirms details, and the result
+# is immutable (read-only breakdown), so cached instances are safe to share.
+@lru_cache(maxsize=1024)
+def _premium_cached(vehicle_age: int, horsepower: int, city: str, coverage_level: CoverageLevel) -> PremiumResult:
+    base, age_factor, power_factor, city_factor = _factors(vehicle_age, horsepower, city)
+    coverage_factor = _COVERAGE_FACTOR[coverage_level]
 
     monthly = base * age_factor * power_factor * city_factor * coverage_factor
 
-    breakdown = {
+    breakdown = MappingProxyType({
         "base": base,
         "age_factor": age_factor,
         "power_factor": power_factor,
         "city_factor": city_factor,
         "coverage_factor": coverage_factor,
-    }
+    })
     return PremiumResult(monthly_eur=round(monthly, 2), breakdown=breakdown)
+
+
+@lru_cache(maxsize=256)
+def _monthly_all_levels(vehicle_age: int, horsepower: int, city: str) -> Tuple[Tuple[str, float], ...]:
+    base, age_factor, power_factor, city_factor = _factors(vehicle_age, horsepower, city)
+    # Same left-to-right product as calculate_premium, so rounding matches exactly.
+    shared = base * age_factor * power_factor * city_factor
+    return tuple((level, round(shared * factor, 2)) for level, factor in _COVERAGE_FACTOR.items())
+
+
+def calculate_premium_all_levels(vehicle_age: int, horsepower: int, city: str) -> Dict[str, float]:
+    return dict(_monthly_all_levels(vehicle_age, horsepower, city))
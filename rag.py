@@ -1,10 +1,57 @@
+import hashlib
+import math
 import os
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from dataclasses import dataclass
-from typing import List, Tuple
+from functools import lru_cache
+from typing import Callable, List, Optional, Tuple
 import numpy as np
 import faiss
 from sentence_transformers import SentenceTransformer
 
+@contextmanager
+def _omp_threads(n: int):
+    prev = faiss.omp_get_max_threads()
+    faiss.omp_set_num_threads(n)
+    try:
+        yield
+    finally:
+        faiss.omp_set_num_threads(prev)
+
+def docs_digest(docs_path: str = "./docs") -> str:
+    # Content hash of the indexed documents; a saved index is reusable while it matches.
+    h = hashlib.sha256()
+    for fn in sorted(os.listdir(docs_path)):
+        if not fn.lower().endswith((".txt", ".md")):
+            continue
+        h.update(fn.encode("utf-8") + b"\0")
+        with open(os.path.join(docs_path, fn), "rb") as f:
+            h.update(hashlib.sha256(f.read()).digest())
+    return h.hexdigest()
+
+def _replace_atomic(path: str, write: Callable[[str], None]) -> None:
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+def _save_npy(path: str, arr: np.ndarray) -> None:
+    with open(path, "wb") as f:  # a file object keeps np.save from appending ".npy"
+        np.save(f, arr)
+
+def _save_pickle(path: str, obj: object) -> None:
+    with open(path, "wb") as f:
+        pickle.dump(obj, f, protocol=5)
+
+def _read_text(path: str) -> str:
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
 @dataclass
 class DocChunk:
     doc_id: str
@@ -13,28 +60,41 @@ class DocChunk:
     score: float
 
 class RAGIndex:
-    def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2"):
-        self.embedder = SentenceTransformer(model_name)
+    def __init__(
+        self,
+        model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+        device: Optional[str] = None,
+        batch_size: int = 128,
+        binary: bool = False,
+    ):
+        self.model_name = model_name
+        self.embedder = SentenceTransformer(model_name, device=device)
+        if str(self.embedder.device).startswith("cuda"):
+            self.embedder.half()  # fp16 halves memory traffic; embeddings are cast back to fp32
+        self.batch_size = batch_size
+        self.binary = binary
         self.index = None
+        self._embs: Optional[np.ndarray] = None  # fp32 rows for reranking binary hits
         self.texts: List[Tuple[str, str, str]] = []  # (doc_id, chunk_id, text)
+        # Per instance, so the cache never outlives (or pins) its embedder.
+        self._query_bytes = lru_cache(maxsize=256)(self._encode_query_bytes)
 
     def _chunk_text(self, text: str, chunk_size: int = 500, overlap: int = 80) -> List[str]: 
-        chunks = []
-        i = 0
-        while i < len(text):
-            chunk = text[i:i+chunk_size]
-            chunks.append(chunk.strip())
-            i += max(1, chunk_size - overlap)
+        step = max(1, chunk_size - overlap)
+        chunks = (text[i:i+chunk_size].strip() for i in range(0, len(text), step))
         return [c for c in chunks if c]
 
     def build_from_folder(self, docs_path: str = "./docs"):
+        with os.scandir(docs_path) as it:
+            entries = [e for e in it if e.name.lower().endswith((".txt", ".md")) and e.is_file()]
+        # Reads are syscall-bound, so overlapping them across threads hides most of the latency.
+        with ThreadPoolExecutor(max_workers=8) as ex:
+            contents = list(ex.map(_read_text, [e.path for e in entries]))
+
         all_chunks = []
-        for fn in os.listdir(docs_path):
-            if not fn.lower().endswith((".txt", ".md")):
-                continue
+        for entry, content in zip(entries, contents):
+            fn = entry.name
             doc_id = fn
-            with open(os.path.join(docs_path, fn), "r", encoding="utf-8") as f:
-                content = f.read()
             chunks = self._chunk_text(content)
             for j, ch in enumerate(chunks):
                 chunk_id = f"{os.path.splitext(fn)[0]}_{j}"
@@ -44,22 +104,158 @@ class RAGIndex:
         if not all_chunks:
             raise RuntimeError(f"No .txt/.md documents found in {docs_path}")
 
-        embs = self.embedder.encode(all_chunks, convert_to_numpy=True, normalize_embeddings=True)
-        embs = embs.astype(np.float32)
+        embs = self.embedder.encode(
+            all_chunks,
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            convert_to_tensor=False,
+            normalize_embeddings=True,
+            show_progress_bar=False,
+        )
+        # No-op for the usual float32 output; only an fp16 (CUDA) model pays for a copy.
+        embs = np.ascontiguousarray(embs, dtype=np.float32)
+        self._encode_query("warm up")  # first real query skips the lazy batch-of-one setup
+
+        if self.binary:
+            # 1 bit per dimension: Hamming search over packed signs, reranked in fp32.
+            self.index = faiss.IndexBinaryFlat(embs.shape[1])
+            self.index.add(np.packbits(embs > 0, axis=1))
+            self._embs = embs
+        else:
+            # Index construction (HNSW insertion, IVF training) is what gains from many threads.
+            with _omp_threads(os.cpu_count() or 1):
+                self.index = self._make_index(embs)
 
-        dim = embs.shape[1]
-        self.index = faiss.IndexFlatIP(dim)  # cosine similarity with normalized vectors
-        self.index.add(embs)
+    @staticmethod
+    def _make_index(embs: np.ndarray):
+        # Inner product on normalized vectors = cosine similarity, whichever index is used.
+        n, dim = embs.shape
+        if n < 2000:
+            index = faiss.IndexFlatIP(dim)
+            index.add(embs)
+        elif n < 200_000:
+            index = faiss.IndexHNSWFlat(dim, 32, faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efConstruction = 200
+            index.add(embs)
+            index.hnsw.efSearch = 64
+        else:
+            m = next(m for m in (32, 16, 8, 4, 2, 1) if dim % m == 0)  # PQ needs dim divisible by m
+            quantizer = faiss.IndexFlatIP(dim)
+            index = faiss.IndexIVFPQ(quantizer, dim, int(4 * math.sqrt(n)), m, 8, faiss.METRIC_INNER_PRODUCT)
+            index.train(embs)
+            index.add(embs)
+            index.nprobe = 16
+        return index
 
-    def retrieve(self, query: str, top_k: int = 4) -> List[DocChunk]:
+    def save(self, path: str, docs_digest: Optional[str] = None) -> None:
+        self._require_index()
+        os.makedirs(path, exist_ok=True)
+        meta_path = os.path.join(path, "rag.pkl")
+        # The metadata is what marks the cache valid: drop it first and write it
+        # last, and replace every file atomically, so an interrupted save only
+        # ever leaves a cache miss behind.
+        try:
+            os.remove(meta_path)
+        except FileNotFoundError:
+            pass
+        index_path = os.path.join(path, "rag.faiss")
+        if self.binary:
+            _replace_atomic(index_path, lambda tmp: faiss.write_index_binary(self.index, tmp))
+            _replace_atomic(os.path.join(path, "rag.npy"), lambda tmp: _save_npy(tmp, self._embs))
+        else:
+            _replace_atomic(index_path, lambda tmp: faiss.write_index(self.index, tmp))
+        meta = {
+            "texts": self.texts,
+            "binary": self.binary,
+            "model_name": self.model_name,
+            "docs_digest": docs_digest,
+        }
+        _replace_atomic(meta_path, lambda tmp: _save_pickle(tmp, meta))
+
+    @classmethod
+    def load(
+        cls,
+        path: str,
+        model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+        docs_digest: Optional[str] = None,
+        **kwargs,
+    ) -> "RAGIndex":
+        with open(os.path.join(path, "rag.pkl"), "rb") as f:
+            meta = pickle.load(f)
+        # Checked before the embedder is loaded, so a stale cache costs almost nothing.
+        if meta["model_name"] != model_name:
+            raise ValueError(f"Saved RAG index was built with {meta['model_name']}, not {model_name}")
+        if docs_digest is not None and meta["docs_digest"] != docs_digest:
+            raise ValueError("Saved RAG index is out of date with the documents")
+
+        rag = cls(model_name, binary=meta["binary"], **kwargs)
+        rag.texts = meta["texts"]
+        index_path = os.path.join(path, "rag.faiss")
+        if rag.binary:
+            rag.index = faiss.read_index_binary(index_path, faiss.IO_FLAG_MMAP)
+            rag._embs = np.load(os.path.join(path, "rag.npy"), mmap_mode="r")
+        else:
+            rag.index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP)
+        rag._encode_query("warm up")
+        return rag
+
+    def _require_index(self) -> None:
         if self.index is None:
             raise RuntimeError("RAG index not built. Call build_from_folder first.")
 
-        q = self.embedder.encode([query], convert_to_numpy=True, normalize_embeddings=True).astype(np.float32)
-        scores, idxs = self.index.search(q, top_k)
+    def _encode_query(self, query: str) -> np.ndarray:
+        q = self.embedder.encode([query], convert_to_numpy=True, convert_to_tensor=False, normalize_embeddings=True)
+        return np.ascontiguousarray(q, dtype=np.float32)
+
+    def _encode_query_bytes(self, query: str) -> bytes:
+        return self._encode_query(query).tobytes()
+
+    def embed_query(self, query: str) -> np.ndarray:
+        # Repeated queries skip tokenization and the forward pass; the cached bytes
+        # come back as a fresh read-only view.
+        return np.frombuffer(self._query_bytes(query), dtype=np.float32).reshape(1, -1)
+
+    def retrieve(
+        self,
+        query: str,
+        top_k: int = 4,
+        ef_search: Optional[int] = None,
+        nprobe: Optional[int] = None,
+    ) -> List[DocChunk]:
+        self._require_index()
+        return self.search(self.embed_query(query), top_k, ef_search=ef_search, nprobe=nprobe)
+
+    def search(
+        self,
+        q: np.ndarray,
+        top_k: int = 4,
+        ef_search: Optional[int] = None,
+        nprobe: Optional[int] = None,
+    ) -> List[DocChunk]:
+        self._require_index()
+        # Recall/speed knobs; ignored by the exact flat index used for small corpora.
+        if ef_search is not None and hasattr(self.index, "hnsw"):
+            self.index.hnsw.efSearch = max(ef_search, top_k)
+        if nprobe is not None and hasattr(self.index, "nprobe"):
+            self.index.nprobe = nprobe
+        # One query is far too little work to amortize an OpenMP fan-out/join.
+        with _omp_threads(1):
+            if self.binary:
+                scores, idxs = self._search_binary(q, top_k)
+            else:
+                scores, idxs = self.index.search(q, top_k)
 
         out: List[DocChunk] = []
         for score, idx in zip(scores[0], idxs[0]):
+            if idx < 0:  # approximate indexes pad with -1 when fewer than top_k hits are found
+                continue
             doc_id, chunk_id, text = self.texts[int(idx)]
             out.append(DocChunk(doc_id=doc_id, chunk_id=chunk_id, text=text, score=float(score)))
         return out
+
+    def _search_binary(self, q: np.ndarray, top_k: int, oversample: int = 4) -> Tuple[np.ndarray, np.ndarray]:
+        _, cand = self.index.search(np.packbits(q > 0, axis=1), oversample * top_k)
+        cand = cand[0][cand[0] >= 0]
+        scores = self._embs[cand] @ q[0]
+        order = np.argsort(-scores)[:top_k]
+        return scores[order][None, :], cand[order][None, :]
@@ -1,13 +1,30 @@
 from __future__ import annotations
 import queue
 import tempfile
+import threading
 import time
+from concurrent.futures import Future
 from dataclasses import dataclass
-from typing import Optional
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
 import numpy as np
 import sounddevice as sd
 import soundfile as sf
 
+WHISPER_RATE = 16000
+
+
+def _resample(x: np.ndarray, src_rate: int, dst_rate: int) -> np.ndarray:
+    if src_rate == dst_rate or x.size == 0:
+        return x
+    if src_rate % dst_rate == 0:
+        # Integer ratio (e.g. 48 kHz): block means low-pass as they decimate.
+        k = src_rate // dst_rate
+        return x[: len(x) - len(x) % k].reshape(-1, k).mean(axis=1, dtype=np.float32)
+    n = int(round(len(x) * dst_rate / src_rate))
+    pos = np.arange(n) * (src_rate / dst_rate)
+    return np.interp(pos, np.arange(len(x)), x).astype(np.float32)
+
+
 @dataclass
 class STTResult:
     text: str
@@ -33,17 +50,40 @@ class VADRecorder:
         self.silence_frames = int(silence_ms / frame_ms)
         self.max_frames = int(max_utterance_s * 1000 / frame_ms)
 
+        # Preallocated capture ring: the audio callback copies each block into
+        # the next slot, so nothing is allocated on the audio thread. It holds
+        # a whole utterance plus ~2 s of slack for the reader falling behind the
+        # writer (Whisper in the same process can stall it); _capture raises
+        # rather than hand out frames the writer has already overwritten.
+        slack = max(8, int(2000 / frame_ms))
+        self._ring = np.empty((self.max_frames + slack, self.frame_samples, channels), dtype=np.float32)
+        self._written = 0
+        self._frame_ready = threading.Event()
+
     @staticmethod
     def _rms(x: np.ndarray) -> float:
-        if x.size == 0:
+        n = x.size
+        if n == 0:
             return 0.0
-        return float(np.sqrt(np.mean(np.square(x))))
+        # One BLAS dot (single pass, no temporary) instead of square + mean.
+        return float(np.sqrt(np.dot(x, x) / n))
 
-    def listen_utterance(self, is_speaking_flag, on_barge_in=None) -> Optional[str]:
-        q_audio: "queue.Queue[np.ndarray]" = queue.Queue()
+    def _frames(self, start: int, end: int) -> np.ndarray:
+        # Copy ring frames [start, end) out as one (samples, channels) array.
+        idx = np.arange(start, end) % len(self._ring)
+        return self._ring[idx].reshape(-1, self.channels)
+
+    def _capture(self, is_speaking_flag, on_barge_in=None) -> Iterator[Tuple[int, float]]:
+        # Yields (ring index, RMS) of every frame that belongs to the utterance.
+        ring = self._ring
+        n_slots = len(ring)
+        self._written = 0
+        self._frame_ready.clear()
 
         def callback(indata, frames, time_info, status):
-            q_audio.put(indata.copy())
+            ring[self._written % n_slots] = indata
+            self._written += 1
+            self._frame_ready.set()
 
         with sd.InputStream(
             samplerate=self.sample_rate,
@@ -53,14 +93,23 @@ class VADRecorder:
             callback=callback,
         ):
             started = False
-            buffer = []
+            start = 0
             silent_count = 0
             frames_count = 0
+            read = 0
 
             while True:
-                frame = q_audio.get()
-                mono = frame[:, 0] if frame.ndim > 1 else frame
-                e = self._rms(mono)
+                while read == self._written:
+                    self._frame_ready.wait()
+                    self._frame_ready.clear()
+                if started:
+                    if self._written - start > n_slots:
+                        raise RuntimeError("Audio capture fell behind; utterance frames were overwritten")
+                elif self._written - read > n_slots:
+                    read = self._written - 1  # nothing kept yet: skip the stale frames
+                i = read
+                read += 1
+                e = self._rms(ring[i % n_slots, :, 0])
 
                 if not started:
                     if e >= self.start_threshold:
@@ -70,13 +119,14 @@ class VADRecorder:
                             except Exception:
                                 pass
                         started = True
-                        buffer.append(frame)
+                        start = i
+                        yield i, e
                         frames_count = 1
                         silent_count = 0
                     else:
                         continue
                 else:
-                    buffer.append(frame)
+                    yield i, e
                     frames_count += 1
 
                     if e < self.stop_threshold:
@@ -87,20 +137,103 @@ class VADRecorder:
                     if silent_count >= self.silence_frames or frames_count >= self.max_frames:
                         break
 
-            if not buffer:
-                return None
+        # The stream is closed now; the writer must not have lapped the
+        # utterance's first frame, which listen_utterance copies out only now.
+        if self._written - start > n_slots:
+            raise RuntimeError("Audio capture fell behind; utterance frames were overwritten")
+
+    def listen_utterance(self, is_speaking_flag, on_barge_in=None) -> Optional[str]:
+        frames = [i for i, _ in self._capture(is_speaking_flag, on_barge_in)]
+        if not frames:
+            return None
 
-            audio = np.concatenate(buffer, axis=0)
-            tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".wav")
-            sf.write(tmp.name, audio, self.sample_rate)
-            return tmp.name
+        audio = self._frames(frames[0], frames[-1] + 1)
+        tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".wav")
+        sf.write(tmp.name, audio, self.sample_rate)
+        return tmp.name
+
+    def _whisper_chunk(self, start: int, end: int) -> np.ndarray:
+        # Whisper takes raw arrays as 16 kHz mono.
+        return _resample(self._frames(start, end)[:, 0], self.sample_rate, WHISPER_RATE)
+
+    def stream_utterance(self, is_speaking_flag, on_barge_in=None, chunk_s: float = 1.5) -> Iterator[np.ndarray]:
+        # 16 kHz mono float32 chunks of at least chunk_s seconds, yielded while the
+        # user is still talking. Each chunk is cut at the next quiet frame (a gap
+        # between words), so words are not split across chunks; a hard cap at
+        # twice chunk_s bounds the latency when there is no pause.
+        chunk_frames = max(1, int(chunk_s * 1000 / self.frame_ms))
+        first: Optional[int] = None
+        last = 0
+        for i, e in self._capture(is_speaking_flag, on_barge_in):
+            if first is None:
+                first = i
+            last = i
+            n = last + 1 - first
+            if n >= chunk_frames and (e < self.stop_threshold or n >= 2 * chunk_frames):
+                yield self._whisper_chunk(first, last + 1)
+                first = None
+        if first is not None:
+            yield self._whisper_chunk(first, last + 1)
 
 class WhisperSTT:
     def __init__(self, model_size: str = "small", device: str = "cpu", compute_type: str = "int8"):
         from faster_whisper import WhisperModel
         self.model = WhisperModel(model_size, device=device, compute_type=compute_type)
 
-    def transcribe(self, wav_path: str) -> STTResult:
-        segments, info = self.model.transcribe(wav_path, vad_filter=True)
+    def transcribe(self, audio: Union[str, np.ndarray], initial_prompt: Optional[str] = None) -> STTResult:
+        segments, info = self.model.transcribe(audio, vad_filter=True, initial_prompt=initial_prompt)
         text = " ".join(seg.text.strip() for seg in segments).strip()
         return STTResult(text=text, language=getattr(info, "language", None))
+
+    def transcribe_stream(self, chunks: Iterable[np.ndarray], max_batch: int = 8) -> STTResult:
+        return self.submit_stream(chunks, max_batch).result()
+
+    def submit_stream(self, chunks: Iterable[np.ndarray], max_batch: int = 8) -> "Future[STTResult]":
+        # Feeds the chunks on the calling thread and returns once they run out; the
+        # last decode finishes on the worker, so the caller can reopen the mic at once.
+        pending: "queue.Queue[Optional[np.ndarray]]" = queue.Queue()
+        result: "Future[STTResult]" = Future()
+        texts: List[str] = []
+        language: Optional[str] = None
+        error: List[BaseException] = []
+
+        def _worker() -> None:
+            nonlocal language
+            done = False
+            while not done:
+                # Whatever piled up while the previous inference ran is decoded
+                # as one contiguous clip: one encoder pass instead of one per chunk.
+                batch = [pending.get()]
+                while len(batch) < max_batch:
+                    try:
+                        batch.append(pending.get_nowait())
+                    except queue.Empty:
+                        break
+                if batch[-1] is None:
+                    done = True
+                    batch.pop()
+                if not batch:
+                    continue
+                audio = batch[0] if len(batch) == 1 else np.concatenate(batch)
+                try:
+                    # The previous hypothesis is the prompt, keeping wording consistent across chunk seams.
+                    res = self.transcribe(audio, initial_prompt=texts[-1] if texts else None)
+                except BaseException as exc:
+                    error.append(exc)
+                    continue
+                if res.text:
+                    texts.append(res.text)
+                language = language or res.language
+
+            if error:
+                result.set_exception(error[0])
+            else:
+                result.set_result(STTResult(text=" ".join(texts).strip(), language=language))
+
+        threading.Thread(target=_worker, daemon=True).start()
+        try:
+            for chunk in chunks:
+                pending.put(chunk)
+        finally:
+            pending.put(None)
+        return result
@@ -1,14 +1,25 @@
 from __future__ import annotations
 import asyncio
+import hashlib
+import io
 import os
-import tempfile
 import threading
 from dataclasses import dataclass
-from typing import Optional
+from concurrent.futures import Future
+from typing import Iterable, List, Optional, Set, Tuple
+import numpy as np
 import sounddevice as sd
 import soundfile as sf
 
 
+def _write_atomic(path: str, data: bytes) -> None:
+    # Readers never see a half-written file, even with prewarm and say racing.
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
 @dataclass(frozen=True)
 class EdgeTTSConfig:
     voice: str = "en-US-JennyNeural"
@@ -22,11 +33,18 @@ class VoiceOut:
         rate: int = 180,
         volume: float = 1.0,
         voice: Optional[str] = None,
+        cache_dir: Optional[str] = "~/.cache/voiceout",
     ) -> None:
         self._lock = threading.Lock()
         self._stop_event = threading.Event()
         self._stream: Optional[sd.OutputStream] = None
 
+        # One long-lived loop for edge-tts instead of an asyncio.run() (new loop,
+        # selector, teardown) per utterance.
+        self._loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._loop_thread.start()
+
         self.rate = max(80, int(rate))
         self.volume = max(0.0, float(volume))
         self.voice = voice or "en-US-JennyNeural"
@@ -37,6 +55,19 @@ class VoiceOut:
             volume=self._format_edge_volume(self.volume),
         )
 
+        # Rendered phrases keyed by text + voice settings: the MP3 as received and
+        # its decoded PCM (.npy), so a repeated phrase skips both synthesis and decoding.
+        # Only fixed phrases registered through prewarm() ever touch the disk;
+        # dynamic replies (claim details, personal data) are never persisted.
+        self._cache_dir: Optional[str] = None
+        self._cacheable: Set[str] = set()
+        if cache_dir:
+            try:
+                os.makedirs(os.path.expanduser(cache_dir), exist_ok=True)
+                self._cache_dir = os.path.expanduser(cache_dir)
+            except OSError:
+                pass
+
     @staticmethod
     def _format_edge_rate(rate_wpm: int) -> str:
         try:
@@ -65,7 +96,63 @@ class VoiceOut:
         except Exception:
             pass
 
-    async def _edge_speech_to_file(self, text: str, outfile: str) -> None:
+    def shutdown(self) -> None:
+        self.stop()
+        if self._loop.is_closed():
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop_thread.join(timeout=2.0)
+        if not self._loop_thread.is_alive():
+            self._loop.close()
+
+    def _cache_base(self, text: str) -> Optional[str]:
+        if self._cache_dir is None or text not in self._cacheable:
+            return None
+        key = "\0".join((text, self._cfg.voice, self._cfg.rate, self._cfg.volume))
+        return os.path.join(self._cache_dir, hashlib.sha256(key.encode("utf-8")).hexdigest())
+
+    def _cache_load(self, text: str) -> Optional[Tuple[np.ndarray, int]]:
+        base = self._cache_base(text)
+        if base is None:
+            return None
+        try:
+            return np.load(base + ".npy"), sf.info(base + ".mp3").samplerate
+        except Exception:
+            return None
+
+    def _cache_store(self, text: str, mp3: bytes, data: np.ndarray) -> None:
+        base = self._cache_base(text)
+        if base is None:
+            return
+        try:
+            _write_atomic(base + ".mp3", mp3)
+            buf = io.BytesIO()
+            np.save(buf, data)
+            _write_atomic(base + ".npy", buf.getvalue())
+        except OSError:
+            pass
+
+    async def _prewarm(self, phrases: List[str]) -> None:
+        for text in phrases:
+            base = self._cache_base(text)
+            if base is None or os.path.exists(base + ".npy"):
+                continue
+            try:
+                mp3 = await self._edge_speech_bytes(text, interruptible=False)
+                data, _ = await asyncio.to_thread(sf.read, io.BytesIO(mp3), dtype="float32")
+                self._cache_store(text, mp3, data)
+            except Exception:
+                continue
+
+    def prewarm(self, phrases: Iterable[str]) -> Optional[Future]:
+        # Renders phrases that are not cached yet in the background; say() is not blocked.
+        if self._cache_dir is None:
+            return None
+        cleaned = [p.strip() for p in phrases if p and p.strip()]
+        self._cacheable.update(cleaned)
+        return asyncio.run_coroutine_threadsafe(self._prewarm(cleaned), self._loop)
+
+    async def _edge_speech_bytes(self, text: str, interruptible: bool = True) -> bytes:
         import edge_tts  # type: ignore
 
         communicate = edge_tts.Communicate(
@@ -74,27 +161,37 @@ class VoiceOut:
             rate=self._cfg.rate,
             volume=self._cfg.volume,
         )
-        await communicate.save(outfile)
-
-    def _play_audio_file(self, path: str) -> None:
-        data, samplerate = sf.read(path, dtype="float32")
+        # Collect the MP3 straight from the websocket stream instead of
+        # round-tripping it through a temp file; a barge-in abandons the download.
+        audio = bytearray()
+        async for chunk in communicate.stream():
+            if interruptible and self._stop_event.is_set():
+                break
+            if chunk["type"] == "audio":
+                audio += chunk["data"]
+        return bytes(audio)
+
+    def _play_audio(self, data: np.ndarray, samplerate: int) -> None:
         if data.ndim == 1:
             data = data.reshape(-1, 1)
 
         self._stop_event.clear()
         pos = 0
+        done = threading.Event()
 
         def callback(outdata, frames, time_info, status) -> None:  # noqa: ARG001
             nonlocal pos
 
             if self._stop_event.is_set():
                 outdata.fill(0)
+                done.set()
                 raise sd.CallbackStop()
 
             chunk = data[pos: pos + frames]
             if len(chunk) < frames:
                 outdata[: len(chunk)] = chunk
                 outdata[len(chunk):] = 0
+                done.set()
                 raise sd.CallbackStop()
 
             outdata[:] = chunk
@@ -106,16 +203,13 @@ class VoiceOut:
                 channels=int(data.shape[1]),
                 dtype="float32",
                 callback=callback,
+                finished_callback=done.set,  # also covers stop() from another thread
             ) as stream:
                 self._stream = stream
-                while stream.active:
-                    sd.sleep(20)
+                # Leaving the block stops the stream, which drains what is already queued.
+                done.wait()
         finally:
             self._stream = None
-            try:
-                os.remove(path)
-            except Exception:
-                pass
 
     def say(self, text: str) -> None:
         cleaned = (text or "").strip()
@@ -124,17 +218,18 @@ class VoiceOut:
 
         with self._lock:
             self._stop_event.clear()
-            tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".mp3")
-            outfile = tmp.name
-            tmp.close()
 
             try:
-                asyncio.run(self._edge_speech_to_file(cleaned, outfile))
-                self._play_audio_file(outfile)
+                cached = self._cache_load(cleaned)
+                if cached is None:
+                    mp3 = asyncio.run_coroutine_threadsafe(self._edge_speech_bytes(cleaned), self._loop).result()
+                    if self._stop_event.is_set() or not mp3:
+                        return
+                    data, samplerate = sf.read(io.BytesIO(mp3), dtype="float32")
+                    self._cache_store(cleaned, mp3, data)
+                else:
+                    data, samplerate = cached
+                self._play_audio(data, samplerate)
             except Exception:
                 if os.getenv("VOICEOUT_ECHO_ON_FAIL") == "1":
                     print(cleaned)
-                try:
-                    os.remove(outfile)
-                except Exception:
-                    pass